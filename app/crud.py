@@ -1,23 +1,112 @@
 """CRUD helper functions for the BDE domain objects."""
 from __future__ import annotations
 
-from typing import Sequence
+from typing import Any, Iterable, Sequence, TypeVar
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, delete, insert, select, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, raiseload
 
 from . import models, schemas
 
 
+_M = TypeVar("_M", bound=models.Base)
+
+
 class CRUDException(Exception):
     """Raised when a CRUD operation cannot be completed."""
 
 
+# List queries feed the API's flat *Read schemas; any relationship access on their
+# results would be an N+1 lazy load and raises instead, so it must be eager loaded.
+_NO_LAZY_LOADS = raiseload("*")
+
+
+# Lookup statements are built once; each call only binds the key parameter.
+_EMPLOYEE_BY_PERSONNEL_NUMBER = select(models.Employee).where(
+    models.Employee.personnel_number == bindparam("personnel_number")
+)
+_MACHINE_BY_CODE = select(models.Machine).where(models.Machine.code == bindparam("code"))
+_WORK_ORDER_BY_NUMBER = select(models.WorkOrder).where(
+    models.WorkOrder.order_number == bindparam("order_number")
+)
+_OPERATION_BY_CODE = select(models.Operation).where(models.Operation.code == bindparam("code"))
+
+# Keys per IN (...) lookup; stays below SQLite's historical limit of 999 bound parameters.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _ids_by_key(db: Session, key_column: Any, id_column: Any, keys: Iterable[Any]) -> dict[Any, int]:
+    """Map the given keys to their ids, querying only rows whose key is in ``keys``."""
+
+    keys = list(keys)
+    ids: dict[Any, int] = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        chunk = keys[start : start + LOOKUP_CHUNK_SIZE]
+        ids.update(db.execute(select(key_column, id_column).where(key_column.in_(chunk))).all())
+    return ids
+
+
+def _require_ids(db: Session, model: type[models.Base], label: str, ids: Iterable[int | None]) -> None:
+    """Raise ``CRUDException`` unless every given id exists, using chunked IN lookups."""
+
+    wanted = {record_id for record_id in ids if record_id is not None}
+    missing = wanted - set(_ids_by_key(db, model.id, model.id, wanted))
+    if missing:
+        raise CRUDException(f"{label} with id {min(missing)} not found")
+
+
+def _insert_all(db: Session, model: type[_M], rows: list[dict[str, Any]], conflict: str) -> list[_M]:
+    """Insert ``rows`` and commit, returning the created objects in input order.
+
+    Dialects that can sort executemany RETURNING rows (SQLite 3.35+, PostgreSQL) get one
+    INSERT ... RETURNING; others, such as MySQL, fall back to a unit-of-work flush.
+    """
+
+    if not rows:
+        return []
+    try:
+        if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+            stmt = insert(model).returning(model, sort_by_parameter_order=True)
+            created = list(db.scalars(stmt, rows))
+        else:
+            created = [model(**row) for row in rows]
+            db.add_all(created)
+            db.flush()
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        raise CRUDException(conflict) from exc
+    return created
+
+
+def _update_by_id(db: Session, model: type[_M], record_id: int, patch: dict[str, Any]) -> _M | None:
+    """Apply ``patch`` and commit; ``None`` if the row does not exist.
+
+    Uses a single UPDATE ... RETURNING where the dialect supports it (SQLite 3.35+,
+    PostgreSQL, not MySQL/MariaDB) and loads the object first otherwise.
+    """
+
+    if not patch:
+        return db.get(model, record_id)
+    if db.get_bind().dialect.update_returning:
+        stmt = update(model).where(model.id == record_id).values(**patch).returning(model)
+        updated = db.scalar(stmt)
+    else:
+        updated = db.get(model, record_id)
+        if updated is None:
+            return None
+        for field, value in patch.items():
+            setattr(updated, field, value)
+    db.commit()
+    return updated
+
+
 # Employee helpers
 
 def list_employees(db: Session) -> Sequence[models.Employee]:
-    return db.scalars(select(models.Employee).order_by(models.Employee.personnel_number)).all()
+    stmt = select(models.Employee).options(_NO_LAZY_LOADS).order_by(models.Employee.personnel_number)
+    return db.scalars(stmt).all()
 
 
 def get_employee(db: Session, employee_id: int) -> models.Employee | None:
@@ -25,8 +114,11 @@ def get_employee(db: Session, employee_id: int) -> models.Employee | None:
 
 
 def get_employee_by_personnel_number(db: Session, personnel_number: str) -> models.Employee | None:
-    stmt = select(models.Employee).where(models.Employee.personnel_number == personnel_number)
-    return db.scalar(stmt)
+    return db.scalar(_EMPLOYEE_BY_PERSONNEL_NUMBER, {"personnel_number": personnel_number})
+
+
+def employee_ids_by_personnel_number(db: Session, personnel_numbers: Iterable[str]) -> dict[str, int]:
+    return _ids_by_key(db, models.Employee.personnel_number, models.Employee.id, personnel_numbers)
 
 
 def create_employee(db: Session, payload: schemas.EmployeeCreate) -> models.Employee:
@@ -37,17 +129,13 @@ def create_employee(db: Session, payload: schemas.EmployeeCreate) -> models.Empl
     except IntegrityError as exc:  # pragma: no cover - defensive programming
         db.rollback()
         raise CRUDException("Employee with this personnel number already exists") from exc
-    db.refresh(employee)
     return employee
 
 
-def update_employee(db: Session, employee: models.Employee, payload: schemas.EmployeeUpdate) -> models.Employee:
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(employee, field, value)
-    db.add(employee)
-    db.commit()
-    db.refresh(employee)
-    return employee
+def update_employee(
+    db: Session, employee_id: int, payload: schemas.EmployeeUpdate
+) -> models.Employee | None:
+    return _update_by_id(db, models.Employee, employee_id, payload.model_dump(exclude_unset=True))
 
 
 def delete_employee(db: Session, employee: models.Employee) -> None:
@@ -58,7 +146,8 @@ def delete_employee(db: Session, employee: models.Employee) -> None:
 # Machine helpers
 
 def list_machines(db: Session) -> Sequence[models.Machine]:
-    return db.scalars(select(models.Machine).order_by(models.Machine.code)).all()
+    stmt = select(models.Machine).options(_NO_LAZY_LOADS).order_by(models.Machine.code)
+    return db.scalars(stmt).all()
 
 
 def get_machine(db: Session, machine_id: int) -> models.Machine | None:
@@ -66,8 +155,11 @@ def get_machine(db: Session, machine_id: int) -> models.Machine | None:
 
 
 def get_machine_by_code(db: Session, code: str) -> models.Machine | None:
-    stmt = select(models.Machine).where(models.Machine.code == code)
-    return db.scalar(stmt)
+    return db.scalar(_MACHINE_BY_CODE, {"code": code})
+
+
+def machine_ids_by_code(db: Session, codes: Iterable[str]) -> dict[str, int]:
+    return _ids_by_key(db, models.Machine.code, models.Machine.id, codes)
 
 
 def create_machine(db: Session, payload: schemas.MachineCreate) -> models.Machine:
@@ -78,17 +170,13 @@ def create_machine(db: Session, payload: schemas.MachineCreate) -> models.Machin
     except IntegrityError as exc:  # pragma: no cover
         db.rollback()
         raise CRUDException("Machine with this code already exists") from exc
-    db.refresh(machine)
     return machine
 
 
-def update_machine(db: Session, machine: models.Machine, payload: schemas.MachineUpdate) -> models.Machine:
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(machine, field, value)
-    db.add(machine)
-    db.commit()
-    db.refresh(machine)
-    return machine
+def update_machine(
+    db: Session, machine_id: int, payload: schemas.MachineUpdate
+) -> models.Machine | None:
+    return _update_by_id(db, models.Machine, machine_id, payload.model_dump(exclude_unset=True))
 
 
 def delete_machine(db: Session, machine: models.Machine) -> None:
@@ -99,7 +187,8 @@ def delete_machine(db: Session, machine: models.Machine) -> None:
 # Work order helpers
 
 def list_work_orders(db: Session) -> Sequence[models.WorkOrder]:
-    return db.scalars(select(models.WorkOrder).order_by(models.WorkOrder.order_number)).all()
+    stmt = select(models.WorkOrder).options(_NO_LAZY_LOADS).order_by(models.WorkOrder.order_number)
+    return db.scalars(stmt).all()
 
 
 def get_work_order(db: Session, work_order_id: int) -> models.WorkOrder | None:
@@ -107,8 +196,11 @@ def get_work_order(db: Session, work_order_id: int) -> models.WorkOrder | None:
 
 
 def get_work_order_by_number(db: Session, order_number: str) -> models.WorkOrder | None:
-    stmt = select(models.WorkOrder).where(models.WorkOrder.order_number == order_number)
-    return db.scalar(stmt)
+    return db.scalar(_WORK_ORDER_BY_NUMBER, {"order_number": order_number})
+
+
+def work_order_ids_by_number(db: Session, order_numbers: Iterable[str]) -> dict[str, int]:
+    return _ids_by_key(db, models.WorkOrder.order_number, models.WorkOrder.id, order_numbers)
 
 
 def create_work_order(db: Session, payload: schemas.WorkOrderCreate) -> models.WorkOrder:
@@ -119,17 +211,13 @@ def create_work_order(db: Session, payload: schemas.WorkOrderCreate) -> models.W
     except IntegrityError as exc:  # pragma: no cover
         db.rollback()
         raise CRUDException("Work order with this number already exists") from exc
-    db.refresh(work_order)
     return work_order
 
 
-def update_work_order(db: Session, work_order: models.WorkOrder, payload: schemas.WorkOrderUpdate) -> models.WorkOrder:
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(work_order, field, value)
-    db.add(work_order)
-    db.commit()
-    db.refresh(work_order)
-    return work_order
+def update_work_order(
+    db: Session, work_order_id: int, payload: schemas.WorkOrderUpdate
+) -> models.WorkOrder | None:
+    return _update_by_id(db, models.WorkOrder, work_order_id, payload.model_dump(exclude_unset=True))
 
 
 def delete_work_order(db: Session, work_order: models.WorkOrder) -> None:
@@ -140,7 +228,8 @@ def delete_work_order(db: Session, work_order: models.WorkOrder) -> None:
 # Operation helpers
 
 def list_operations(db: Session) -> Sequence[models.Operation]:
-    return db.scalars(select(models.Operation).order_by(models.Operation.code)).all()
+    stmt = select(models.Operation).options(_NO_LAZY_LOADS).order_by(models.Operation.code)
+    return db.scalars(stmt).all()
 
 
 def get_operation(db: Session, operation_id: int) -> models.Operation | None:
@@ -148,29 +237,30 @@ def get_operation(db: Session, operation_id: int) -> models.Operation | None:
 
 
 def get_operation_by_code(db: Session, code: str) -> models.Operation | None:
-    stmt = select(models.Operation).where(models.Operation.code == code)
-    return db.scalar(stmt)
+    return db.scalar(_OPERATION_BY_CODE, {"code": code})
+
+
+def operation_ids_by_code(db: Session, codes: Iterable[str]) -> dict[str, int]:
+    return _ids_by_key(db, models.Operation.code, models.Operation.id, codes)
 
 
 def create_operation(db: Session, payload: schemas.OperationCreate) -> models.Operation:
-    operation = models.Operation(**payload.model_dump())
-    db.add(operation)
-    try:
-        db.commit()
-    except IntegrityError as exc:  # pragma: no cover
-        db.rollback()
-        raise CRUDException("Operation with this code already exists") from exc
-    db.refresh(operation)
-    return operation
+    return create_operations_bulk(db, [payload])[0]
 
 
-def update_operation(db: Session, operation: models.Operation, payload: schemas.OperationUpdate) -> models.Operation:
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(operation, field, value)
-    db.add(operation)
-    db.commit()
-    db.refresh(operation)
-    return operation
+def create_operations_bulk(
+    db: Session, payloads: Sequence[schemas.OperationCreate]
+) -> list[models.Operation]:
+    rows = [payload.model_dump() for payload in payloads]
+    _require_ids(db, models.WorkOrder, "Work order", (row["work_order_id"] for row in rows))
+    _require_ids(db, models.Machine, "Machine", (row["machine_id"] for row in rows))
+    return _insert_all(db, models.Operation, rows, "Operation with this code already exists")
+
+
+def update_operation(
+    db: Session, operation_id: int, payload: schemas.OperationUpdate
+) -> models.Operation | None:
+    return _update_by_id(db, models.Operation, operation_id, payload.model_dump(exclude_unset=True))
 
 
 def delete_operation(db: Session, operation: models.Operation) -> None:
@@ -181,30 +271,50 @@ def delete_operation(db: Session, operation: models.Operation) -> None:
 # Activity record helpers
 
 def list_activity_records(db: Session) -> Sequence[models.ActivityRecord]:
-    return db.scalars(select(models.ActivityRecord).order_by(models.ActivityRecord.start_time.desc())).all()
+    stmt = (
+        select(models.ActivityRecord)
+        .options(_NO_LAZY_LOADS)
+        .order_by(models.ActivityRecord.start_time.desc())
+    )
+    return db.scalars(stmt).all()
 
 
 def get_activity_record(db: Session, record_id: int) -> models.ActivityRecord | None:
     return db.get(models.ActivityRecord, record_id)
 
 
-def create_activity_record(db: Session, payload: schemas.ActivityRecordCreate) -> models.ActivityRecord:
-    activity = models.ActivityRecord(**payload.model_dump())
-    db.add(activity)
-    db.commit()
-    db.refresh(activity)
-    return activity
-
-
-def update_activity_record(db: Session, activity: models.ActivityRecord, payload: schemas.ActivityRecordUpdate) -> models.ActivityRecord:
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(activity, field, value)
-    db.add(activity)
-    db.commit()
-    db.refresh(activity)
-    return activity
+def activity_record_ids(db: Session, record_ids: Iterable[int]) -> set[int]:
+    return set(_ids_by_key(db, models.ActivityRecord.id, models.ActivityRecord.id, record_ids))
 
 
-def delete_activity_record(db: Session, activity: models.ActivityRecord) -> None:
-    db.delete(activity)
+def create_activity_record(db: Session, payload: schemas.ActivityRecordCreate) -> models.ActivityRecord:
+    return create_activity_records_bulk(db, [payload])[0]
+
+
+def create_activity_records_bulk(
+    db: Session, payloads: Sequence[schemas.ActivityRecordCreate]
+) -> list[models.ActivityRecord]:
+    rows = [payload.model_dump() for payload in payloads]
+    _require_ids(db, models.Employee, "Employee", (row["employee_id"] for row in rows))
+    _require_ids(db, models.Operation, "Operation", (row["operation_id"] for row in rows))
+    return _insert_all(db, models.ActivityRecord, rows, "Activity record could not be stored")
+
+
+def update_activity_record(
+    db: Session, activity_record_id: int, payload: schemas.ActivityRecordUpdate
+) -> models.ActivityRecord | None:
+    return _update_by_id(db, models.ActivityRecord, activity_record_id, payload.model_dump(exclude_unset=True))
+
+
+def delete_activity_record(db: Session, record_id: int) -> bool:
+    # Activity records have no dependent rows, so the ORM cascade can be bypassed.
+    stmt = delete(models.ActivityRecord).where(models.ActivityRecord.id == record_id)
+    if db.get_bind().dialect.delete_returning:
+        deleted = db.scalar(stmt.returning(models.ActivityRecord.id)) is not None
+    else:
+        record = db.get(models.ActivityRecord, record_id)
+        deleted = record is not None
+        if deleted:
+            db.delete(record)
     db.commit()
+    return deleted
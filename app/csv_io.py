@@ -2,17 +2,71 @@
 from __future__ import annotations
 
 import csv
-import io
-from dataclasses import dataclass
+import functools
+import hashlib
+import operator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, date
-from typing import Iterable, Mapping
+from enum import Enum
+from typing import Any, Callable, Iterable, Iterator, Mapping, Sequence
 
+from pydantic import BaseModel
+from sqlalchemy import Boolean, Date, DateTime, Result, Select, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from . import crud, schemas
+from . import crud, models, schemas
+
+# Number of rows written per bulk statement/transaction during CSV imports.
+IMPORT_BATCH_SIZE = 10_000
+# Number of rows fetched per round-trip while streaming CSV exports.
+EXPORT_BATCH_SIZE = 1_000
+
+
+EMPLOYEE_COLUMNS = ("personnel_number", "first_name", "last_name", "department", "role", "active")
+MACHINE_COLUMNS = ("code", "name", "description", "location", "active")
+WORK_ORDER_COLUMNS = ("order_number", "customer", "article", "quantity", "due_date", "status")
+OPERATION_COLUMNS = (
+    "code",
+    "description",
+    "order_number",
+    "machine_code",
+    "standard_time_minutes",
+    "is_active",
+)
+ACTIVITY_RECORD_COLUMNS = (
+    "id",
+    "start_time",
+    "end_time",
+    "personnel_number",
+    "operation_code",
+    "quantity_good",
+    "quantity_reject",
+    "status",
+    "comment",
+)
+
+# Header row of each entity's CSV file, in the line format written by csv.writer.
+CSV_HEADERS = {
+    entity: ",".join(columns) + "\r\n"
+    for entity, columns in (
+        ("employees", EMPLOYEE_COLUMNS),
+        ("machines", MACHINE_COLUMNS),
+        ("work_orders", WORK_ORDER_COLUMNS),
+        ("operations", OPERATION_COLUMNS),
+        ("activity_records", ACTIVITY_RECORD_COLUMNS),
+    )
+}
+
+
 class CSVImportError(Exception):
     """Raised when CSV data cannot be imported."""
 
+    def __init__(self, message: str, row: int | None = None) -> None:
+        super().__init__(f"Row {row}: {message}" if row is not None else message)
+        self.row = row
+
 
 @dataclass
 class ImportSummary:
@@ -25,320 +79,506 @@ class ImportSummary:
         return {"inserted": self.inserted, "updated": self.updated}
 
 
+_TRUTHY = frozenset({"true", "1", "yes", "ja", "y"})
+
+
 def _parse_bool(value: str | None, default: bool = True) -> bool:
-    if value is None or value == "":
-        return default
-    return str(value).strip().lower() in {"true", "1", "yes", "ja", "y"}
+    return value.strip().lower() in _TRUTHY if value else default
 
 
 def _parse_int(value: str | None) -> int | None:
-    if value is None or value == "":
-        return None
-    return int(value)
+    return int(value) if value else None
 
 
 def _parse_float(value: str | None) -> float | None:
-    if value is None or value == "":
-        return None
-    return float(value)
+    return float(value) if value else None
 
 
+@functools.lru_cache(maxsize=4096)
 def _parse_date(value: str | None) -> date | None:
-    if value is None or value == "":
-        return None
-    return date.fromisoformat(value)
+    # Due dates repeat a lot within one file, so parsed values are memoized.
+    return date.fromisoformat(value) if value else None
 
 
 def _parse_datetime(value: str | None) -> datetime | None:
-    if value is None or value == "":
-        return None
-    return datetime.fromisoformat(value)
-
-
-def _format_value(value: object) -> str:
-    if value is None:
-        return ""
-    if isinstance(value, (datetime, date)):
-        return value.isoformat()
-    if isinstance(value, bool):
-        return "true" if value else "false"
-    return str(value)
-
-
-def _write_csv(fieldnames: list[str], rows: Iterable[Mapping[str, object]]) -> str:
-    buffer = io.StringIO()
-    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
-    writer.writeheader()
-    for row in rows:
-        writer.writerow({field: _format_value(row.get(field)) for field in fieldnames})
-    return buffer.getvalue()
-
-
-def export_employees(db: Session) -> str:
-    fieldnames = ["personnel_number", "first_name", "last_name", "department", "role", "active"]
-    employees = crud.list_employees(db)
-    rows = (
-        {
-            "personnel_number": employee.personnel_number,
-            "first_name": employee.first_name,
-            "last_name": employee.last_name,
-            "department": employee.department,
-            "role": employee.role,
-            "active": employee.active,
-        }
-        for employee in employees
-    )
-    return _write_csv(fieldnames, rows)
-
-
-def export_machines(db: Session) -> str:
-    fieldnames = ["code", "name", "description", "location", "active"]
-    machines = crud.list_machines(db)
-    rows = (
-        {
-            "code": machine.code,
-            "name": machine.name,
-            "description": machine.description,
-            "location": machine.location,
-            "active": machine.active,
-        }
-        for machine in machines
-    )
-    return _write_csv(fieldnames, rows)
-
-
-def export_work_orders(db: Session) -> str:
-    fieldnames = ["order_number", "customer", "article", "quantity", "due_date", "status"]
-    work_orders = crud.list_work_orders(db)
-    rows = (
-        {
-            "order_number": order.order_number,
-            "customer": order.customer,
-            "article": order.article,
-            "quantity": order.quantity,
-            "due_date": order.due_date,
-            "status": order.status,
-        }
-        for order in work_orders
-    )
-    return _write_csv(fieldnames, rows)
-
-
-def export_operations(db: Session) -> str:
-    fieldnames = [
-        "code",
-        "description",
-        "order_number",
-        "machine_code",
-        "standard_time_minutes",
-        "is_active",
-    ]
-    operations = crud.list_operations(db)
-    rows = (
-        {
-            "code": operation.code,
-            "description": operation.description,
-            "order_number": operation.work_order.order_number if operation.work_order else "",
-            "machine_code": operation.machine.code if operation.machine else "",
-            "standard_time_minutes": operation.standard_time_minutes,
-            "is_active": operation.is_active,
-        }
-        for operation in operations
-    )
-    return _write_csv(fieldnames, rows)
-
-
-def export_activity_records(db: Session) -> str:
-    fieldnames = [
-        "id",
-        "start_time",
-        "end_time",
-        "personnel_number",
-        "operation_code",
-        "quantity_good",
-        "quantity_reject",
-        "status",
-        "comment",
-    ]
-    records = crud.list_activity_records(db)
-    rows = (
-        {
-            "id": record.id,
-            "start_time": record.start_time,
-            "end_time": record.end_time,
-            "personnel_number": record.employee.personnel_number,
-            "operation_code": record.operation.code,
-            "quantity_good": record.quantity_good,
-            "quantity_reject": record.quantity_reject,
-            "status": record.status,
-            "comment": record.comment,
-        }
-        for record in records
-    )
-    return _write_csv(fieldnames, rows)
+    return datetime.fromisoformat(value) if value else None
+
+
+def _read_columns(
+    file_obj: Iterable[str], columns: Sequence[str], required: Sequence[str]
+) -> Iterator[tuple[int, tuple[str, ...]]]:
+    """Yield the line number and the cells of ``columns`` for each CSV row.
+
+    Absent cells are returned as empty strings. The header is checked before any row is
+    read, so a file for the wrong entity is rejected without parsing its body.
+    """
+
+    reader = csv.reader(file_obj)
+    header = next(reader, [])
+    unknown = [name for name in header if name and name not in columns]
+    if unknown:
+        raise CSVImportError(f"Unexpected columns in CSV header: {', '.join(unknown)}", 1)
+    missing = [name for name in required if name not in header]
+    if missing:
+        raise CSVImportError(f"Missing columns in CSV header: {', '.join(missing)}", 1)
+    width = len(header)
+    # Columns missing from the header read the "" sentinel appended to each row.
+    extract = operator.itemgetter(*(header.index(name) if name in header else -1 for name in columns))
+    padding = [""] * width
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            row.extend(padding[len(row) :])
+        row.append("")
+        yield reader.line_num, extract(row)
 
 
-def import_employees(db: Session, file_obj: io.TextIOBase) -> ImportSummary:
-    reader = csv.DictReader(file_obj)
-    summary = ImportSummary()
-    for row in reader:
-        personnel_number = (row.get("personnel_number") or "").strip()
-        if not personnel_number:
-            raise CSVImportError("Missing personnel_number in employee import")
-        payload = schemas.EmployeeCreate(
-            personnel_number=personnel_number,
-            first_name=(row.get("first_name") or "").strip(),
-            last_name=(row.get("last_name") or "").strip(),
-            department=row.get("department") or None,
-            role=row.get("role") or None,
-            active=_parse_bool(row.get("active"), True),
-        )
-        existing = crud.get_employee_by_personnel_number(db, personnel_number)
-        if existing:
-            update = schemas.EmployeeUpdate(**payload.model_dump(exclude={"personnel_number"}))
-            crud.update_employee(db, existing, update)
-            summary.updated += 1
+@dataclass
+class _PendingWrites:
+    """Rows of one import, split into new rows and primary-key updates.
+
+    The CSV line of every queued row is kept so write conflicts can be located.
+    """
+
+    existing_ids: Mapping[Any, int]
+    summary: ImportSummary = field(default_factory=ImportSummary)
+    inserts: list[dict[str, Any]] = field(default_factory=list)
+    updates: list[dict[str, Any]] = field(default_factory=list)
+    _insert_lines: list[int] = field(default_factory=list)
+    _update_lines: list[int] = field(default_factory=list)
+    _insert_positions: dict[Any, int] = field(default_factory=dict)
+
+    def add(self, key: Any, row: dict[str, Any], line: int) -> None:
+        """Queue ``row`` as an update if ``key`` exists, otherwise as an insert."""
+
+        record_id = self.existing_ids.get(key)
+        if record_id is not None:
+            self.update(record_id, row, line)
+        elif key in self._insert_positions:
+            # Repeated key within the same file: the last row wins.
+            position = self._insert_positions[key]
+            self.inserts[position] = row
+            self._insert_lines[position] = line
+            self.summary.updated += 1
         else:
-            crud.create_employee(db, payload)
-            summary.inserted += 1
-    return summary
+            self._insert_positions[key] = len(self.inserts)
+            self.insert(row, line)
 
+    def insert(self, row: dict[str, Any], line: int) -> None:
+        self.inserts.append(row)
+        self._insert_lines.append(line)
+        self.summary.inserted += 1
 
-def import_machines(db: Session, file_obj: io.TextIOBase) -> ImportSummary:
-    reader = csv.DictReader(file_obj)
-    summary = ImportSummary()
-    for row in reader:
-        code = (row.get("code") or "").strip()
-        if not code:
-            raise CSVImportError("Missing code in machine import")
-        payload = schemas.MachineCreate(
-            code=code,
-            name=(row.get("name") or "").strip(),
-            description=row.get("description") or None,
-            location=row.get("location") or None,
-            active=_parse_bool(row.get("active"), True),
+    def update(self, record_id: int, row: dict[str, Any], line: int) -> None:
+        self.updates.append({"id": record_id, **row})
+        self._update_lines.append(line)
+        self.summary.updated += 1
+
+    def write(self, db: Session, model: type[models.Base]) -> ImportSummary:
+        """Write all queued rows in the session's transaction and commit once.
+
+        Any failure rolls back the whole file, so an import is never applied partially.
+        """
+
+        statements = (
+            (insert(model), self.inserts, self._insert_lines),
+            (update(model), self.updates, self._update_lines),
         )
-        existing = crud.get_machine_by_code(db, code)
-        if existing:
-            update = schemas.MachineUpdate(**payload.model_dump(exclude={"code"}))
-            crud.update_machine(db, existing, update)
-            summary.updated += 1
-        else:
-            crud.create_machine(db, payload)
-            summary.inserted += 1
-    return summary
+        try:
+            for stmt, rows, lines in statements:
+                for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+                    batch_lines = lines[start : start + IMPORT_BATCH_SIZE]
+                    try:
+                        db.execute(stmt, rows[start : start + IMPORT_BATCH_SIZE])
+                    except IntegrityError as exc:
+                        # Another import may have created the same keys in the meantime.
+                        raise CSVImportError(
+                            f"Conflicting {model.__tablename__} data in rows "
+                            f"{min(batch_lines)}-{max(batch_lines)}, import rolled back"
+                        ) from exc
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return self.summary
 
 
-def import_work_orders(db: Session, file_obj: io.TextIOBase) -> ImportSummary:
-    reader = csv.DictReader(file_obj)
-    summary = ImportSummary()
-    for row in reader:
-        order_number = (row.get("order_number") or "").strip()
-        if not order_number:
-            raise CSVImportError("Missing order_number in work order import")
-        payload = schemas.WorkOrderCreate(
-            order_number=order_number,
-            customer=row.get("customer") or None,
-            article=row.get("article") or None,
-            quantity=_parse_int(row.get("quantity")),
-            due_date=_parse_date(row.get("due_date")),
-            status=(row.get("status") or "open").strip() or "open",
+def _column_keys(records: Sequence[tuple[int, tuple[str, ...]]], index: int) -> set[str]:
+    """Return the distinct non-empty keys found in column ``index`` of ``records``."""
+
+    return {key for key in (values[index].strip() for _, values in records) if key}
+
+
+def _validated(schema: type[BaseModel], row: dict[str, Any]) -> dict[str, Any]:
+    """Validate ``row`` against ``schema`` and return the validated field values.
+
+    The instance's field dict is reused as is instead of serializing it again via
+    ``model_dump()``.
+    """
+
+    return schema.model_validate(row).__dict__
+
+
+def _format_bool(value: bool) -> str:
+    return "true" if value else "false"
+
+
+# csv.writer formats str, int, float and None cells itself in C; only the column types
+# whose str() differs from the file format need a Python-level conversion.
+_CELL_FORMATTERS: tuple[tuple[type, Callable[[Any], str]], ...] = (
+    (Boolean, _format_bool),
+    (DateTime, datetime.isoformat),
+    (Date, date.isoformat),
+)
+
+
+def _cell_conversions(stmt: Select) -> tuple[tuple[int, Callable[[Any], str]], ...]:
+    """Return ``(position, formatter)`` for each selected column that needs converting."""
+
+    conversions = []
+    for position, column in enumerate(stmt.selected_columns):
+        for column_type, formatter in _CELL_FORMATTERS:
+            if isinstance(column.type, column_type):
+                conversions.append((position, formatter))
+                break
+    return tuple(conversions)
+
+
+class _Lines(list):
+    """File-like sink collecting the lines csv.writer produces."""
+
+    write = list.append
+
+
+def _stream_csv(header: str, db: Session, stmt: Select) -> Iterator[bytes]:
+    """Yield UTF-8 encoded CSV for the rows of ``stmt``, ordered like ``header``.
+
+    Each fetched batch of ``EXPORT_BATCH_SIZE`` rows is written with one ``writerows``
+    call and encoded once, so the HTTP layer sends one message per batch.
+    """
+
+    conversions = _cell_conversions(stmt)
+
+    def convert(row: Sequence[object]) -> list[object]:
+        cells = list(row)
+        for position, formatter in conversions:
+            value = cells[position]
+            if value is not None:
+                cells[position] = formatter(value)
+        return cells
+
+    lines = _Lines([header])
+    writerows = csv.writer(lines).writerows
+    for batch in _stream_rows(db, stmt).partitions():
+        writerows(map(convert, batch) if conversions else batch)
+        yield "".join(lines).encode()
+        lines.clear()
+    if lines:
+        yield "".join(lines).encode()
+
+
+def _stream_rows(db: Session, stmt: Select) -> Result[Any]:
+    return db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+
+def export_employees(db: Session) -> Iterator[bytes]:
+    stmt = select(
+        models.Employee.personnel_number,
+        models.Employee.first_name,
+        models.Employee.last_name,
+        models.Employee.department,
+        models.Employee.role,
+        models.Employee.active,
+    ).order_by(models.Employee.personnel_number)
+    yield from _stream_csv(CSV_HEADERS["employees"], db, stmt)
+
+
+def export_machines(db: Session) -> Iterator[bytes]:
+    stmt = select(
+        models.Machine.code,
+        models.Machine.name,
+        models.Machine.description,
+        models.Machine.location,
+        models.Machine.active,
+    ).order_by(models.Machine.code)
+    yield from _stream_csv(CSV_HEADERS["machines"], db, stmt)
+
+
+def export_work_orders(db: Session) -> Iterator[bytes]:
+    stmt = select(
+        models.WorkOrder.order_number,
+        models.WorkOrder.customer,
+        models.WorkOrder.article,
+        models.WorkOrder.quantity,
+        models.WorkOrder.due_date,
+        models.WorkOrder.status,
+    ).order_by(models.WorkOrder.order_number)
+    yield from _stream_csv(CSV_HEADERS["work_orders"], db, stmt)
+
+
+def export_operations(db: Session) -> Iterator[bytes]:
+    stmt = (
+        select(
+            models.Operation.code,
+            models.Operation.description,
+            models.WorkOrder.order_number,
+            models.Machine.code.label("machine_code"),
+            models.Operation.standard_time_minutes,
+            models.Operation.is_active,
         )
-        existing = crud.get_work_order_by_number(db, order_number)
-        if existing:
-            update = schemas.WorkOrderUpdate(
-                **payload.model_dump(exclude={"order_number"})
-            )
-            crud.update_work_order(db, existing, update)
-            summary.updated += 1
-        else:
-            crud.create_work_order(db, payload)
-            summary.inserted += 1
-    return summary
+        .outerjoin(models.Operation.work_order)
+        .outerjoin(models.Operation.machine)
+        .order_by(models.Operation.code)
+    )
+    yield from _stream_csv(CSV_HEADERS["operations"], db, stmt)
+
+
+def export_activity_records(db: Session) -> Iterator[bytes]:
+    stmt = (
+        select(
+            models.ActivityRecord.id,
+            models.ActivityRecord.start_time,
+            models.ActivityRecord.end_time,
+            models.Employee.personnel_number,
+            models.Operation.code.label("operation_code"),
+            models.ActivityRecord.quantity_good,
+            models.ActivityRecord.quantity_reject,
+            models.ActivityRecord.status,
+            models.ActivityRecord.comment,
+        )
+        .join(models.ActivityRecord.employee)
+        .join(models.ActivityRecord.operation)
+    )
+    # Deliberately unordered: activity records grow without bound and sorting the full
+    # table only to write a file is wasted work, so rows stream in storage order.
+    yield from _stream_csv(CSV_HEADERS["activity_records"], db, stmt)
+
+
+# Tables whose rows appear in each export, including those joined in for key columns.
+_EXPORT_SOURCES: dict[str, tuple[type[models.Base], ...]] = {
+    "employees": (models.Employee,),
+    "machines": (models.Machine,),
+    "work_orders": (models.WorkOrder,),
+    "operations": (models.Operation, models.WorkOrder, models.Machine),
+    "activity_records": (models.ActivityRecord, models.Employee, models.Operation),
+}
 
 
-def import_operations(db: Session, file_obj: io.TextIOBase) -> ImportSummary:
-    reader = csv.DictReader(file_obj)
-    summary = ImportSummary()
-    for row in reader:
-        code = (row.get("code") or "").strip()
+def export_etag(db: Session, entity: str) -> str:
+    """Return an ETag for the entity's export from the revisions of its source tables.
+
+    Revisions advance with every committed insert, update or delete, in commit order,
+    so the tag changes whenever the exported data can have changed, without reading rows.
+    """
+
+    names = [model.__tablename__ for model in _EXPORT_SOURCES[entity]]
+    stmt = select(models.TableRevision.table_name, models.TableRevision.revision).where(
+        models.TableRevision.table_name.in_(names)
+    )
+    revisions = dict(db.execute(stmt).tuples().all())
+    values = tuple((name, revisions.get(name, 0)) for name in names)
+    digest = hashlib.blake2b(repr(values).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def _optional(value: str) -> str | None:
+    return value or None
+
+
+def _status(default: str) -> Callable[[str], str]:
+    def parse(value: str) -> str:
+        return value.strip() or default
+
+    return parse
+
+
+def _build_importer(
+    model: type[models.Base],
+    key_field: str,
+    schema: type[BaseModel],
+    label: str,
+    id_map: Callable[[Session, Iterable[str]], Mapping[str, int]],
+    col_parsers: Mapping[str, Callable[[str], Any]],
+) -> Callable[[Session, Iterable[str]], ImportSummary]:
+    """Create the importer for a master data entity identified by ``key_field``.
+
+    ``col_parsers`` lists the CSV columns in file order with the function turning each
+    raw cell into the schema value. Everything the row loop needs is bound to closure
+    locals up front, so the loop runs without attribute or global lookups.
+    """
+
+    columns = tuple(col_parsers)
+    parsers = tuple(col_parsers.values())
+    key_index = columns.index(key_field)
+    missing_key = f"Missing {key_field} in {label} import"
+    validate = functools.partial(_validated, schema)
+
+    def importer(db: Session, file_obj: Iterable[str]) -> ImportSummary:
+        records = list(_read_columns(file_obj, columns, (key_field,)))
+        writes = _PendingWrites(id_map(db, _column_keys(records, key_index)))
+        add = writes.add
+        for line, values in records:
+            if not values[key_index].strip():
+                raise CSVImportError(missing_key, line)
+            row = {column: parse(value) for column, parse, value in zip(columns, parsers, values)}
+            add(row[key_field], validate(row), line)
+        return writes.write(db, model)
+
+    importer.__name__ = importer.__qualname__ = f"import_{model.__tablename__}"
+    return importer
+
+
+import_employees = _build_importer(
+    models.Employee,
+    "personnel_number",
+    schemas.EmployeeCreate,
+    "employee",
+    crud.employee_ids_by_personnel_number,
+    {
+        "personnel_number": str.strip,
+        "first_name": str.strip,
+        "last_name": str.strip,
+        "department": _optional,
+        "role": _optional,
+        "active": _parse_bool,
+    },
+)
+
+
+import_machines = _build_importer(
+    models.Machine,
+    "code",
+    schemas.MachineCreate,
+    "machine",
+    crud.machine_ids_by_code,
+    {
+        "code": str.strip,
+        "name": str.strip,
+        "description": _optional,
+        "location": _optional,
+        "active": _parse_bool,
+    },
+)
+
+
+import_work_orders = _build_importer(
+    models.WorkOrder,
+    "order_number",
+    schemas.WorkOrderCreate,
+    "work order",
+    crud.work_order_ids_by_number,
+    {
+        "order_number": str.strip,
+        "customer": _optional,
+        "article": _optional,
+        "quantity": _parse_int,
+        "due_date": _parse_date,
+        "status": _status("open"),
+    },
+)
+
+
+def import_operations(db: Session, file_obj: Iterable[str]) -> ImportSummary:
+    records = list(_read_columns(file_obj, OPERATION_COLUMNS, ("code", "order_number")))
+    work_order_ids = crud.work_order_ids_by_number(db, _column_keys(records, 2))
+    machine_ids = crud.machine_ids_by_code(db, _column_keys(records, 3))
+    writes = _PendingWrites(crud.operation_ids_by_code(db, _column_keys(records, 0)))
+    for line, (
+        code,
+        description,
+        order_number,
+        machine_code,
+        standard_time_minutes,
+        is_active,
+    ) in records:
+        code = code.strip()
         if not code:
-            raise CSVImportError("Missing code in operation import")
-        order_number = (row.get("order_number") or "").strip()
+            raise CSVImportError("Missing code in operation import", line)
+        order_number = order_number.strip()
         if not order_number:
-            raise CSVImportError("Missing order_number for operation import")
-        work_order = crud.get_work_order_by_number(db, order_number)
-        if not work_order:
-            raise CSVImportError(f"Work order '{order_number}' not found for operation {code}")
-        machine_code = (row.get("machine_code") or "").strip()
+            raise CSVImportError("Missing order_number for operation import", line)
+        work_order_id = work_order_ids.get(order_number)
+        if not work_order_id:
+            raise CSVImportError(f"Work order '{order_number}' not found for operation {code}", line)
+        machine_code = machine_code.strip()
         machine_id = None
         if machine_code:
-            machine = crud.get_machine_by_code(db, machine_code)
-            if not machine:
-                raise CSVImportError(f"Machine '{machine_code}' not found for operation {code}")
-            machine_id = machine.id
-        payload = schemas.OperationCreate(
-            code=code,
-            description=row.get("description") or None,
-            work_order_id=work_order.id,
-            machine_id=machine_id,
-            standard_time_minutes=_parse_float(row.get("standard_time_minutes")),
-            is_active=_parse_bool(row.get("is_active"), True),
+            machine_id = machine_ids.get(machine_code)
+            if not machine_id:
+                raise CSVImportError(f"Machine '{machine_code}' not found for operation {code}", line)
+        payload = _validated(
+            schemas.OperationCreate,
+            {
+                "code": code,
+                "description": description or None,
+                "work_order_id": work_order_id,
+                "machine_id": machine_id,
+                "standard_time_minutes": _parse_float(standard_time_minutes),
+                "is_active": _parse_bool(is_active, True),
+            },
         )
-        existing = crud.get_operation_by_code(db, code)
-        if existing:
-            update = schemas.OperationUpdate(
-                **payload.model_dump(exclude={"code"})
-            )
-            crud.update_operation(db, existing, update)
-            summary.updated += 1
-        else:
-            crud.create_operation(db, payload)
-            summary.inserted += 1
-    return summary
+        writes.add(code, payload, line)
+    return writes.write(db, models.Operation)
 
 
-def import_activity_records(db: Session, file_obj: io.TextIOBase) -> ImportSummary:
-    reader = csv.DictReader(file_obj)
-    summary = ImportSummary()
-    for row in reader:
-        start_time = _parse_datetime(row.get("start_time"))
+def import_activity_records(db: Session, file_obj: Iterable[str]) -> ImportSummary:
+    records = list(
+        _read_columns(
+            file_obj, ACTIVITY_RECORD_COLUMNS, ("start_time", "personnel_number", "operation_code")
+        )
+    )
+    employee_ids = crud.employee_ids_by_personnel_number(db, _column_keys(records, 3))
+    operation_ids = crud.operation_ids_by_code(db, _column_keys(records, 4))
+    existing = crud.activity_record_ids(db, {_parse_int(key) for key in _column_keys(records, 0)})
+    writes = _PendingWrites({})
+    for line, (
+        raw_id,
+        raw_start_time,
+        end_time,
+        employee_number,
+        operation_code,
+        quantity_good,
+        quantity_reject,
+        status,
+        comment,
+    ) in records:
+        start_time = _parse_datetime(raw_start_time)
         if not start_time:
-            raise CSVImportError("Missing or invalid start_time in activity import")
-        employee_number = (row.get("personnel_number") or "").strip()
+            raise CSVImportError("Missing or invalid start_time in activity import", line)
+        employee_number = employee_number.strip()
         if not employee_number:
-            raise CSVImportError("Missing personnel_number in activity import")
-        employee = crud.get_employee_by_personnel_number(db, employee_number)
-        if not employee:
-            raise CSVImportError(f"Employee '{employee_number}' not found")
-        operation_code = (row.get("operation_code") or "").strip()
+            raise CSVImportError("Missing personnel_number in activity import", line)
+        employee_id = employee_ids.get(employee_number)
+        if not employee_id:
+            raise CSVImportError(f"Employee '{employee_number}' not found", line)
+        operation_code = operation_code.strip()
         if not operation_code:
-            raise CSVImportError("Missing operation_code in activity import")
-        operation = crud.get_operation_by_code(db, operation_code)
-        if not operation:
-            raise CSVImportError(f"Operation '{operation_code}' not found")
-        payload = schemas.ActivityRecordCreate(
-            start_time=start_time,
-            end_time=_parse_datetime(row.get("end_time")),
-            employee_id=employee.id,
-            operation_id=operation.id,
-            quantity_good=_parse_int(row.get("quantity_good")) or 0,
-            quantity_reject=_parse_int(row.get("quantity_reject")) or 0,
-            status=(row.get("status") or "completed").strip() or "completed",
-            comment=row.get("comment") or None,
+            raise CSVImportError("Missing operation_code in activity import", line)
+        operation_id = operation_ids.get(operation_code)
+        if not operation_id:
+            raise CSVImportError(f"Operation '{operation_code}' not found", line)
+        payload = _validated(
+            schemas.ActivityRecordCreate,
+            {
+                "start_time": start_time,
+                "end_time": _parse_datetime(end_time),
+                "employee_id": employee_id,
+                "operation_id": operation_id,
+                "quantity_good": _parse_int(quantity_good) or 0,
+                "quantity_reject": _parse_int(quantity_reject) or 0,
+                "status": status.strip() or "completed",
+                "comment": comment or None,
+            },
         )
-        record_id = _parse_int(row.get("id"))
+        record_id = _parse_int(raw_id)
         if record_id:
-            existing = crud.get_activity_record(db, record_id)
-            if not existing:
-                raise CSVImportError(f"Activity record with id {record_id} not found")
-            update = schemas.ActivityRecordUpdate(**payload.model_dump())
-            crud.update_activity_record(db, existing, update)
-            summary.updated += 1
+            if record_id not in existing:
+                raise CSVImportError(f"Activity record with id {record_id} not found", line)
+            writes.update(record_id, payload, line)
         else:
-            crud.create_activity_record(db, payload)
-            summary.inserted += 1
-    return summary
+            writes.insert(payload, line)
+    return writes.write(db, models.ActivityRecord)
 
 
 EXPORTERS = {
@@ -357,3 +597,52 @@ IMPORTERS = {
     "operations": import_operations,
     "activity_records": import_activity_records,
 }
+
+
+# Path parameter type for the CSV endpoints, so unknown entities are rejected at routing.
+EntityName = Enum("EntityName", {name: name for name in EXPORTERS}, type=str)
+
+
+# Master data files have no references to each other and can be imported concurrently;
+# operations and activity records resolve keys from them and are imported afterwards.
+INDEPENDENT_ENTITIES = ("employees", "machines", "work_orders")
+DEPENDENT_ENTITIES = ("operations", "activity_records")
+
+
+def _import_in_own_session(
+    db_factory: Callable[[], Session], entity: str, file_obj: Iterable[str]
+) -> ImportSummary:
+    db = db_factory()
+    try:
+        return IMPORTERS[entity](db, file_obj)
+    finally:
+        db.close()
+
+
+def import_all(
+    db_factory: Callable[[], Session], files: Mapping[str, Iterable[str]]
+) -> dict[str, ImportSummary]:
+    """Import CSV files for several entities at once.
+
+    Employees, machines and work orders run in parallel worker threads, each with
+    its own session from ``db_factory``; operations and activity records follow
+    sequentially because they reference the master data.
+    """
+
+    unknown = set(files) - set(IMPORTERS)
+    if unknown:
+        raise CSVImportError(f"Unknown entities: {', '.join(sorted(unknown))}")
+    independent = [entity for entity in INDEPENDENT_ENTITIES if entity in files]
+    summaries: dict[str, ImportSummary] = {}
+    if independent:
+        with ThreadPoolExecutor(max_workers=len(independent)) as pool:
+            futures = {
+                entity: pool.submit(_import_in_own_session, db_factory, entity, files[entity])
+                for entity in independent
+            }
+            for entity, future in futures.items():
+                summaries[entity] = future.result()
+    for entity in DEPENDENT_ENTITIES:
+        if entity in files:
+            summaries[entity] = _import_in_own_session(db_factory, entity, files[entity])
+    return summaries
@@ -1,27 +1,128 @@
 """Database configuration for the IWS BDE system."""
 from __future__ import annotations
 
+import os
 from collections.abc import Generator
+from typing import Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import Connection, DateTime, Engine, create_engine, event, inspect, make_url
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import StaticPool
 
-DATABASE_URL = "sqlite:///./bde.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bde.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
+
+def _engine_options(url: str) -> dict[str, Any]:
+    """Return pool settings suited to the configured database backend."""
+
+    parsed = make_url(url)
+    is_sqlite = parsed.get_backend_name() == "sqlite"
+    # Server databases reach their best throughput with a larger pool than SQLite,
+    # whose single writer lock limits the benefit of parallel connections.
+    pool_options: dict[str, Any] = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10" if is_sqlite else "25")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20" if is_sqlite else "25")),
+    }
+    if not is_sqlite:
+        # Server databases drop idle connections; validate and recycle them.
+        return {**pool_options, "pool_pre_ping": True, "pool_recycle": 1800}
+    # Concurrent imports queue on SQLite's single writer lock instead of failing fast.
+    options: dict[str, Any] = {"connect_args": {"check_same_thread": False, "timeout": 30}}
+    if parsed.database in (None, "", ":memory:"):
+        # Every new connection to an in-memory database would see an empty schema.
+        options["poolclass"] = StaticPool
+    else:
+        options.update(pool_options)
+    return options
+
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+
+# Applied to every new SQLite connection: WAL lets readers proceed during imports and
+# synchronous=NORMAL only fsyncs at checkpoints instead of on every commit.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
 )
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+
+
+# Objects keep their loaded state after commit, so returning a freshly written row
+# to the client does not trigger another SELECT.
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
 
 
 class Base(DeclarativeBase):
     """Base class for all ORM models."""
 
 
+def _add_updated_at(connection: Connection, table_name: str) -> None:
+    table = connection.dialect.identifier_preparer.quote(table_name)
+    column_type = DateTime().compile(dialect=connection.dialect)
+    if connection.dialect.name == "sqlite":
+        # SQLite only adds columns with constant defaults; backfill existing rows after.
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table} ADD COLUMN updated_at {column_type} NOT NULL "
+            "DEFAULT '1970-01-01 00:00:00'"
+        )
+        connection.exec_driver_sql(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+    else:
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table} ADD COLUMN updated_at {column_type} NOT NULL "
+            "DEFAULT CURRENT_TIMESTAMP"
+        )
+
+
+def create_schema(bind: Engine) -> None:
+    """Create missing tables and bring tables from earlier releases up to date.
+
+    ``create_all`` never alters existing tables, so the ``updated_at`` column and the
+    indexes added since are created here when their columns are not indexed yet. The
+    ``table_revisions`` table is new and is seeded by ``create_all`` itself.
+    """
+
+    Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            if "updated_at" not in columns:
+                _add_updated_at(connection, table.name)
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        covered = {tuple(index["column_names"]) for index in inspector.get_indexes(table.name)}
+        covered.update(
+            tuple(constraint["column_names"])
+            for constraint in inspector.get_unique_constraints(table.name)
+        )
+        for index in table.indexes:
+            # Key columns of earlier releases are already indexed by their UNIQUE
+            # constraint; a second B-tree on them would only slow down writes.
+            if tuple(column.name for column in index.columns) not in covered:
+                index.create(bind, checkfirst=True)
+
+
 def get_db() -> Generator:
-    """Provide a transactional scope around a series of operations."""
+    """Provide a transactional scope around a series of operations.
+
+    Creating the session is cheap: it checks out a pooled connection only when the
+    first statement runs, and endpoints that never query do not depend on it at all.
+    """
     db = SessionLocal()
     try:
         yield db
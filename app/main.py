@@ -1,17 +1,36 @@
 """FastAPI application exposing the IWS BDE system."""
 from __future__ import annotations
 
-import io
-
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile, status
-from fastapi.responses import Response
+import codecs
+import hashlib
+import os
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Sequence
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from . import crud, csv_io, models, schemas
-from .database import Base, engine, get_db
+from .database import create_schema, engine, get_db
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Create or upgrade the schema once per process at startup unless disabled.
+
+    Deployments whose schema is managed by migrations set ``AUTO_CREATE_SCHEMA=0``.
+    """
+
+    if os.getenv("AUTO_CREATE_SCHEMA", "1") == "1":
+        await run_in_threadpool(create_schema, engine)
+    yield
 
-# Ensure the database schema exists as soon as the application module is imported.
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="IWS BDE Plattform",
@@ -20,25 +39,103 @@ app = FastAPI(
         "Standards."
     ),
     version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 
-@app.get("/", tags=["System"])
-def root() -> dict[str, str]:
-    """Return a short introduction for the API."""
+# ---------------------------------------------------------------------------
+# Conditional GET
+# ---------------------------------------------------------------------------
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _body_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+@app.middleware("http")
+async def add_etag(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """Tag buffered GET responses with an ETag and answer repeats with 304.
+
+    Streamed responses (the CSV exports) carry no Content-Length and pass through
+    untouched, so they are never buffered here. Responses that already carry an ETag
+    are only revalidated, never drained and hashed again.
+    """
+
+    response = await call_next(request)
+    if (
+        request.method != "GET"
+        or response.status_code != status.HTTP_200_OK
+        or "content-length" not in response.headers
+    ):
+        return response
+    etag = response.headers.get("etag")
+    if etag is None:
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = _body_etag(body)
+        headers = dict(response.headers)
+        headers["etag"] = etag
+        response = Response(content=body, status_code=response.status_code, headers=headers)
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return response
+
+
+# ---------------------------------------------------------------------------
+# List serialization
+# ---------------------------------------------------------------------------
+
+# List endpoints serialize through adapters compiled once at import instead of
+# FastAPI's per-request response_model validation and jsonable_encoder pass.
+EMPLOYEE_LIST_ADAPTER = TypeAdapter(list[schemas.EmployeeRead])
+MACHINE_LIST_ADAPTER = TypeAdapter(list[schemas.MachineRead])
+WORK_ORDER_LIST_ADAPTER = TypeAdapter(list[schemas.WorkOrderRead])
+OPERATION_LIST_ADAPTER = TypeAdapter(list[schemas.OperationRead])
+ACTIVITY_RECORD_LIST_ADAPTER = TypeAdapter(list[schemas.ActivityRecordRead])
+
+
+def _list_response(adapter: TypeAdapter[Any], rows: Sequence[Any]) -> Response:
+    items = adapter.validate_python(rows, from_attributes=True)
+    return Response(content=adapter.dump_json(items), media_type="application/json")
 
-    return {
+
+def _constant_response(content: dict[str, str]) -> Response:
+    """Encode ``content`` once and attach its ETag, so neither is computed per request."""
+
+    response = ORJSONResponse(content)
+    response.headers["etag"] = _body_etag(response.body)
+    return response
+
+
+_ROOT_RESPONSE = _constant_response(
+    {
         "name": "IWS BDE Plattform",
         "documentation": "/docs",
         "csv_endpoints": "/csv/{entity}",
     }
+)
+_HEALTH_RESPONSE = _constant_response({"status": "ok"})
+
+
+@app.get("/", tags=["System"])
+async def root() -> Response:
+    """Return a short introduction for the API."""
+
+    return _ROOT_RESPONSE
 
 
 @app.get("/health", tags=["System"])
-def health() -> dict[str, str]:
+async def health() -> Response:
     """Basic health endpoint."""
 
-    return {"status": "ok"}
+    return _HEALTH_RESPONSE
 
 
 # ---------------------------------------------------------------------------
@@ -46,9 +143,14 @@ def health() -> dict[str, str]:
 # ---------------------------------------------------------------------------
 
 
-@app.get("/employees", response_model=list[schemas.EmployeeRead], tags=["Employee"])
-def list_employees(db: Session = Depends(get_db)):
-    return crud.list_employees(db)
+@app.get(
+    "/employees",
+    response_model=None,
+    responses={200: {"model": list[schemas.EmployeeRead]}},
+    tags=["Employee"],
+)
+def list_employees(db: Session = Depends(get_db)) -> Response:
+    return _list_response(EMPLOYEE_LIST_ADAPTER, crud.list_employees(db))
 
 
 @app.post(
@@ -76,10 +178,10 @@ def read_employee(employee_id: int, db: Session = Depends(get_db)):
 def update_employee(
     employee_id: int, payload: schemas.EmployeeUpdate, db: Session = Depends(get_db)
 ):
-    employee = crud.get_employee(db, employee_id)
+    employee = crud.update_employee(db, employee_id, payload)
     if not employee:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Employee not found")
-    return crud.update_employee(db, employee, payload)
+    return employee
 
 
 @app.delete("/employees/{employee_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Employee"])
@@ -96,9 +198,14 @@ def delete_employee(employee_id: int, db: Session = Depends(get_db)):
 # ---------------------------------------------------------------------------
 
 
-@app.get("/machines", response_model=list[schemas.MachineRead], tags=["Machine"])
-def list_machines(db: Session = Depends(get_db)):
-    return crud.list_machines(db)
+@app.get(
+    "/machines",
+    response_model=None,
+    responses={200: {"model": list[schemas.MachineRead]}},
+    tags=["Machine"],
+)
+def list_machines(db: Session = Depends(get_db)) -> Response:
+    return _list_response(MACHINE_LIST_ADAPTER, crud.list_machines(db))
 
 
 @app.post(
@@ -126,10 +233,10 @@ def read_machine(machine_id: int, db: Session = Depends(get_db)):
 def update_machine(
     machine_id: int, payload: schemas.MachineUpdate, db: Session = Depends(get_db)
 ):
-    machine = crud.get_machine(db, machine_id)
+    machine = crud.update_machine(db, machine_id, payload)
     if not machine:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Machine not found")
-    return crud.update_machine(db, machine, payload)
+    return machine
 
 
 @app.delete("/machines/{machine_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Machine"])
@@ -146,9 +253,14 @@ def delete_machine(machine_id: int, db: Session = Depends(get_db)):
 # ---------------------------------------------------------------------------
 
 
-@app.get("/work-orders", response_model=list[schemas.WorkOrderRead], tags=["WorkOrder"])
-def list_work_orders(db: Session = Depends(get_db)):
-    return crud.list_work_orders(db)
+@app.get(
+    "/work-orders",
+    response_model=None,
+    responses={200: {"model": list[schemas.WorkOrderRead]}},
+    tags=["WorkOrder"],
+)
+def list_work_orders(db: Session = Depends(get_db)) -> Response:
+    return _list_response(WORK_ORDER_LIST_ADAPTER, crud.list_work_orders(db))
 
 
 @app.post(
@@ -184,10 +296,10 @@ def read_work_order(work_order_id: int, db: Session = Depends(get_db)):
 def update_work_order(
     work_order_id: int, payload: schemas.WorkOrderUpdate, db: Session = Depends(get_db)
 ):
-    work_order = crud.get_work_order(db, work_order_id)
+    work_order = crud.update_work_order(db, work_order_id, payload)
     if not work_order:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Work order not found")
-    return crud.update_work_order(db, work_order, payload)
+    return work_order
 
 
 @app.delete(
@@ -208,9 +320,14 @@ def delete_work_order(work_order_id: int, db: Session = Depends(get_db)):
 # ---------------------------------------------------------------------------
 
 
-@app.get("/operations", response_model=list[schemas.OperationRead], tags=["Operation"])
-def list_operations(db: Session = Depends(get_db)):
-    return crud.list_operations(db)
+@app.get(
+    "/operations",
+    response_model=None,
+    responses={200: {"model": list[schemas.OperationRead]}},
+    tags=["Operation"],
+)
+def list_operations(db: Session = Depends(get_db)) -> Response:
+    return _list_response(OPERATION_LIST_ADAPTER, crud.list_operations(db))
 
 
 @app.post(
@@ -242,10 +359,10 @@ def read_operation(operation_id: int, db: Session = Depends(get_db)):
 def update_operation(
     operation_id: int, payload: schemas.OperationUpdate, db: Session = Depends(get_db)
 ):
-    operation = crud.get_operation(db, operation_id)
+    operation = crud.update_operation(db, operation_id, payload)
     if not operation:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Operation not found")
-    return crud.update_operation(db, operation, payload)
+    return operation
 
 
 @app.delete(
@@ -268,11 +385,12 @@ def delete_operation(operation_id: int, db: Session = Depends(get_db)):
 
 @app.get(
     "/activity-records",
-    response_model=list[schemas.ActivityRecordRead],
+    response_model=None,
+    responses={200: {"model": list[schemas.ActivityRecordRead]}},
     tags=["Activity"],
 )
-def list_activity_records(db: Session = Depends(get_db)):
-    return crud.list_activity_records(db)
+def list_activity_records(db: Session = Depends(get_db)) -> Response:
+    return _list_response(ACTIVITY_RECORD_LIST_ADAPTER, crud.list_activity_records(db))
 
 
 @app.post(
@@ -284,7 +402,10 @@ def list_activity_records(db: Session = Depends(get_db)):
 def create_activity_record(
     payload: schemas.ActivityRecordCreate, db: Session = Depends(get_db)
 ):
-    return crud.create_activity_record(db, payload)
+    try:
+        return crud.create_activity_record(db, payload)
+    except crud.CRUDException as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc)) from exc
 
 
 @app.get(
@@ -307,10 +428,10 @@ def read_activity_record(record_id: int, db: Session = Depends(get_db)):
 def update_activity_record(
     record_id: int, payload: schemas.ActivityRecordUpdate, db: Session = Depends(get_db)
 ):
-    record = crud.get_activity_record(db, record_id)
+    record = crud.update_activity_record(db, record_id, payload)
     if not record:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Activity record not found")
-    return crud.update_activity_record(db, record, payload)
+    return record
 
 
 @app.delete(
@@ -319,10 +440,8 @@ def update_activity_record(
     tags=["Activity"],
 )
 def delete_activity_record(record_id: int, db: Session = Depends(get_db)):
-    record = crud.get_activity_record(db, record_id)
-    if not record:
+    if not crud.delete_activity_record(db, record_id):
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Activity record not found")
-    crud.delete_activity_record(db, record)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -331,37 +450,71 @@ def delete_activity_record(record_id: int, db: Session = Depends(get_db)):
 # ---------------------------------------------------------------------------
 
 
+@app.exception_handler(RequestValidationError)
+async def unknown_entity_not_found(request: Request, exc: RequestValidationError) -> Response:
+    """Report unknown CSV entities as 404 rather than a 422 validation error."""
+
+    for error in exc.errors():
+        if tuple(error["loc"]) == ("path", "entity"):
+            return ORJSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"detail": f"Unknown entity '{error['input']}'"},
+            )
+    return await request_validation_exception_handler(request, exc)
+
+
+def _close_when_exhausted(chunks: Iterator[bytes], db: Session) -> Iterator[bytes]:
+    """Release the session once the streamed export has been fully sent.
+
+    Exporters are lazy generators, so their queries only run while the response
+    body is being sent, after ``get_db`` has already returned the session.
+    """
+
+    try:
+        yield from chunks
+    finally:
+        db.close()
+
+
 @app.get(
     "/csv/{entity}",
-    response_class=Response,
+    response_class=StreamingResponse,
     responses={200: {"content": {"text/csv": {}}}},
     tags=["CSV"],
 )
-def export_entity_csv(entity: str, db: Session = Depends(get_db)):
-    exporter = csv_io.EXPORTERS.get(entity)
-    if not exporter:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Unknown entity '{entity}'")
-    csv_content = exporter(db)
-    filename = f"{entity}.csv"
-    headers = {"Content-Disposition": f"attachment; filename={filename}"}
-    return Response(content=csv_content, media_type="text/csv", headers=headers)
+def export_entity_csv(
+    entity: csv_io.EntityName, request: Request, db: Session = Depends(get_db)
+):
+    exporter = csv_io.EXPORTERS[entity.value]
+    etag = csv_io.export_etag(db, entity.value)
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    filename = f"{entity.value}.csv"
+    headers = {"Content-Disposition": f"attachment; filename={filename}", "ETag": etag}
+    return StreamingResponse(
+        _close_when_exhausted(exporter(db), db), media_type="text/csv", headers=headers
+    )
+
+
+_ALLOWED_CONTENT_TYPES = frozenset({"text/csv", "application/vnd.ms-excel", None})
 
 
 @app.post("/csv/{entity}", tags=["CSV"])
 async def import_entity_csv(
-    entity: str,
+    entity: csv_io.EntityName,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
 ):
-    importer = csv_io.IMPORTERS.get(entity)
-    if not importer:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Unknown entity '{entity}'")
-    if file.content_type not in ("text/csv", "application/vnd.ms-excel", None):
+    importer = csv_io.IMPORTERS[entity.value]
+    if file.content_type not in _ALLOWED_CONTENT_TYPES:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Unsupported content type")
-    content = (await file.read()).decode("utf-8-sig")
-    stream = io.StringIO(content)
+    # Decode the spooled upload line by line instead of reading it into memory first.
+    # Lines split on b"\n" only, so cells containing U+2028 or NEL stay intact.
+    stream = codecs.iterdecode(file.file, "utf-8-sig")
     try:
-        summary = importer(db, stream)
+        summary = await run_in_threadpool(importer, db, stream)
     except csv_io.CSVImportError as exc:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc)) from exc
+    except UnicodeDecodeError as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "CSV file is not valid UTF-8") from exc
     return summary.as_dict()
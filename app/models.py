@@ -1,26 +1,56 @@
 """SQLAlchemy models for the IWS BDE system."""
 from __future__ import annotations
 
-from datetime import datetime, date
-
-from sqlalchemy import Date, DateTime, ForeignKey, String, UniqueConstraint
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime, date, timezone
+from itertools import chain
+
+from sqlalchemy import (
+    Connection,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    String,
+    Table,
+    UniqueConstraint,
+    event,
+    func,
+    text,
+    update,
+)
+from sqlalchemy.orm import Mapped, ORMExecuteState, Session, UOWTransaction, mapped_column, relationship
 
 from .database import Base
 
 
+def _utcnow() -> datetime:
+    # Naive UTC like SQL CURRENT_TIMESTAMP.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _updated_at_column() -> Mapped[datetime]:
+    return mapped_column(
+        DateTime,
+        default=_utcnow,
+        onupdate=_utcnow,
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
 class Employee(Base):
     """Employee master data."""
 
     __tablename__ = "employees"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    personnel_number: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    personnel_number: Mapped[str] = mapped_column(String(50), unique=True, index=True, nullable=False)
     first_name: Mapped[str] = mapped_column(String(120), nullable=False)
     last_name: Mapped[str] = mapped_column(String(120), nullable=False)
     department: Mapped[str | None] = mapped_column(String(120), default=None)
     role: Mapped[str | None] = mapped_column(String(120), default=None)
     active: Mapped[bool] = mapped_column(default=True)
+    updated_at: Mapped[datetime] = _updated_at_column()
 
     activities: Mapped[list[ActivityRecord]] = relationship(
         back_populates="employee",
@@ -34,11 +64,12 @@ class Machine(Base):
     __tablename__ = "machines"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    code: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    code: Mapped[str] = mapped_column(String(50), unique=True, index=True, nullable=False)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     description: Mapped[str | None] = mapped_column(String(250))
     location: Mapped[str | None] = mapped_column(String(120))
     active: Mapped[bool] = mapped_column(default=True)
+    updated_at: Mapped[datetime] = _updated_at_column()
 
     operations: Mapped[list[Operation]] = relationship(
         back_populates="machine",
@@ -52,12 +83,13 @@ class WorkOrder(Base):
     __tablename__ = "work_orders"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    order_number: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    order_number: Mapped[str] = mapped_column(String(50), unique=True, index=True, nullable=False)
     customer: Mapped[str | None] = mapped_column(String(120))
     article: Mapped[str | None] = mapped_column(String(120))
     quantity: Mapped[int | None] = mapped_column(default=None)
     due_date: Mapped[date | None] = mapped_column(Date, default=None)
     status: Mapped[str | None] = mapped_column(String(50), default="open")
+    updated_at: Mapped[datetime] = _updated_at_column()
 
     operations: Mapped[list[Operation]] = relationship(
         back_populates="work_order",
@@ -69,7 +101,12 @@ class Operation(Base):
     """Operations that belong to work orders."""
 
     __tablename__ = "operations"
-    __table_args__ = (UniqueConstraint("code", name="uq_operation_code"),)
+    __table_args__ = (
+        UniqueConstraint("code", name="uq_operation_code"),
+        # Foreign key lookups behind the work order/machine relationships and cascades.
+        Index("ix_operations_work_order", "work_order_id"),
+        Index("ix_operations_machine", "machine_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     code: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -78,6 +115,7 @@ class Operation(Base):
     machine_id: Mapped[int | None] = mapped_column(ForeignKey("machines.id"), default=None)
     standard_time_minutes: Mapped[float | None] = mapped_column(default=None)
     is_active: Mapped[bool] = mapped_column(default=True)
+    updated_at: Mapped[datetime] = _updated_at_column()
 
     work_order: Mapped[WorkOrder] = relationship(back_populates="operations")
     machine: Mapped[Machine | None] = relationship(back_populates="operations")
@@ -91,6 +129,12 @@ class ActivityRecord(Base):
     """Captured production data."""
 
     __tablename__ = "activity_records"
+    __table_args__ = (
+        # Per-employee lookups, optionally narrowed by operation and time range.
+        Index("ix_activity_emp_op_time", "employee_id", "operation_id", "start_time"),
+        # Serves the newest-first listing in crud.list_activity_records without a full sort.
+        Index("ix_activity_records_start_time_desc", text("start_time DESC")),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     start_time: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -101,6 +145,74 @@ class ActivityRecord(Base):
     quantity_reject: Mapped[int] = mapped_column(default=0)
     status: Mapped[str | None] = mapped_column(String(50), default="completed")
     comment: Mapped[str | None] = mapped_column(String(250))
+    updated_at: Mapped[datetime] = _updated_at_column()
 
     employee: Mapped[Employee] = relationship(back_populates="activities")
     operation: Mapped[Operation] = relationship(back_populates="activities")
+
+
+
+class TableRevision(Base):
+    """Write counter per table, bumped in the transaction that changes the table."""
+
+    __tablename__ = "table_revisions"
+
+    table_name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    revision: Mapped[int] = mapped_column(default=0, nullable=False)
+
+
+# Every table except the counters themselves.
+REVISED_TABLES = tuple(
+    table.name for table in Base.metadata.sorted_tables if table is not TableRevision.__table__
+)
+
+
+@event.listens_for(TableRevision.__table__, "after_create")
+def _seed_revisions(target: Table, connection: Connection, **kw: object) -> None:
+    connection.execute(target.insert(), [{"table_name": name, "revision": 0} for name in REVISED_TABLES])
+
+
+def _written_tables(session: Session) -> set[str]:
+    return session.info.setdefault("written_tables", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_writes(session: Session, flush_context: UOWTransaction) -> None:
+    # Still populated here; cascaded deletes are already part of session.deleted.
+    written = _written_tables(session)
+    for instance in chain(session.new, session.dirty, session.deleted):
+        written.add(instance.__table__.name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement_writes(state: ORMExecuteState) -> None:
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush.
+    if state.is_insert or state.is_update or state.is_delete:
+        name = state.statement.table.name
+        if name in REVISED_TABLES:
+            _written_tables(state.session).add(name)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_revisions(session: Session) -> None:
+    """Advance the revision of every written table as the last statement before COMMIT.
+
+    The UPDATE locks the counter rows until the commit, so concurrent writers to a table
+    bump it one after another and a reader never sees a revision whose data is not
+    committed yet. Unlike an application timestamp this only moves forward.
+    """
+
+    session.flush()
+    written = session.info.pop("written_tables", None)
+    if written:
+        session.execute(
+            update(TableRevision)
+            .where(TableRevision.table_name.in_(written))
+            .values(revision=TableRevision.revision + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session: Session) -> None:
+    session.info.pop("written_tables", None)
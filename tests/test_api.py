@@ -1,34 +1,78 @@
 from __future__ import annotations
 
 import io
+import os
+import threading
 from datetime import datetime
 
+import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, inspect, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
+from app import crud, csv_io, main, models, schemas
 from app.database import Base, get_db
 from app.main import app
 
-# Set up an in-memory database for the tests
-engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+# The schema is created on the test database below; keep the app from touching ./bde.db.
+os.environ["AUTO_CREATE_SCHEMA"] = "0"
+
+# Set up an in-memory database for the tests; the schema is created once per run.
+engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(
+    autoflush=False, autocommit=False, expire_on_commit=False, join_transaction_mode="create_savepoint"
+)
+
+
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    # pysqlite's own BEGIN handling breaks SAVEPOINTs; let SQLAlchemy emit BEGIN itself.
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _begin_sqlite_transaction(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
 Base.metadata.create_all(bind=engine)
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@pytest.fixture
+def connection():
+    """Run each test in an outer transaction that is rolled back afterwards.
+
+    Sessions join it through savepoints, so commits made by the app stay invisible to
+    other tests without recreating the schema.
+    """
 
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            yield conn
+        finally:
+            transaction.rollback()
 
-app.dependency_overrides[get_db] = override_get_db
-client = TestClient(app)
+
+@pytest.fixture
+def client(connection):
+    def override_get_db():
+        db = TestingSessionLocal(bind=connection)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
 
 
-def test_full_bde_workflow():
+def test_full_bde_workflow(client):
     # Create master data
     employee_payload = {
         "personnel_number": "1000",
@@ -124,6 +168,372 @@ def test_full_bde_workflow():
     assert any(emp["role"] == "Teamleiter" for emp in data)
 
 
-def test_unknown_csv_entity():
+def test_get_responses_support_etag_revalidation(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get("/health", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get("/health", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_unknown_csv_entity(client):
     response = client.get("/csv/unknown")
     assert response.status_code == 404
+
+
+def test_csv_import_resolves_references_by_key(client):
+    files = {
+        "file": (
+            "work_orders.csv",
+            "order_number,customer,article,quantity,due_date,status\n"
+            "WO-CSV-1,Kunde,Flansch,10,2024-03-01,open\n",
+            "text/csv",
+        )
+    }
+    assert client.post("/csv/work_orders", files=files).json() == {"inserted": 1, "updated": 0}
+
+    files = {
+        "file": (
+            "operations.csv",
+            "code,description,order_number,machine_code,standard_time_minutes,is_active\n"
+            "OP-CSV-10,Sägen,WO-CSV-1,,4.0,true\n"
+            "OP-CSV-20,Entgraten,WO-CSV-1,,,true\n",
+            "text/csv",
+        )
+    }
+    assert client.post("/csv/operations", files=files).json() == {"inserted": 2, "updated": 0}
+
+    client.post(
+        "/employees",
+        json={"personnel_number": "CSV-1", "first_name": "Erika", "last_name": "Muster"},
+    )
+    files = {
+        "file": (
+            "activity_records.csv",
+            "id,start_time,end_time,personnel_number,operation_code,quantity_good,quantity_reject,status,comment\n"
+            ",2024-03-01T06:00:00,2024-03-01T10:00:00,CSV-1,OP-CSV-10,40,0,completed,\n"
+            ",2024-03-01T10:00:00,,CSV-1,OP-CSV-20,38,2,,\n",
+            "text/csv",
+        )
+    }
+    assert client.post("/csv/activity_records", files=files).json() == {"inserted": 2, "updated": 0}
+
+    response = client.get("/csv/activity_records")
+    assert "CSV-1,OP-CSV-10,40,0" in response.text
+    assert "CSV-1,OP-CSV-20,38,2" in response.text
+
+    files = {
+        "file": (
+            "operations.csv",
+            "code,description,order_number,machine_code,standard_time_minutes,is_active\n"
+            "OP-CSV-30,Prüfen,WO-UNKNOWN,,,true\n",
+            "text/csv",
+        )
+    }
+    response = client.post("/csv/operations", files=files)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Row 2: Work order 'WO-UNKNOWN' not found for operation OP-CSV-30"
+
+
+def test_list_queries_refuse_lazy_relationship_loads(client, connection):
+    response = client.post("/work-orders", json={"order_number": "WO-LAZY-1"})
+    assert response.status_code == 201
+
+    db = TestingSessionLocal(bind=connection)
+    try:
+        work_order = next(wo for wo in crud.list_work_orders(db) if wo.order_number == "WO-LAZY-1")
+        with pytest.raises(InvalidRequestError):
+            work_order.operations
+    finally:
+        db.close()
+
+
+def test_update_and_delete_report_missing_records(client):
+    response = client.post("/machines", json={"code": "M-UPD-1", "name": "Presse"})
+    machine_id = response.json()["id"]
+
+    response = client.put(f"/machines/{machine_id}", json={"location": "Halle 2"})
+    assert response.status_code == 200
+    assert response.json()["location"] == "Halle 2"
+    assert response.json()["name"] == "Presse"
+
+    assert client.put("/machines/999999", json={"name": "Fehlt"}).status_code == 404
+    assert client.delete("/activity-records/999999").status_code == 404
+
+
+def test_csv_export_supports_conditional_requests(client):
+    assert client.post("/machines", json={"code": "M-ETAG-1", "name": "Presse"}).status_code == 201
+
+    response = client.get("/csv/machines")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "last-modified" not in response.headers
+
+    assert client.get("/csv/machines", headers={"If-None-Match": etag}).status_code == 304
+
+    files = {"file": ("machines.csv", "code,name\nM-ETAG-1,Presse neu\n", "text/csv")}
+    assert client.post("/csv/machines", files=files).json() == {"inserted": 0, "updated": 1}
+
+    response = client.get("/csv/machines", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert "M-ETAG-1,Presse neu" in response.text
+
+
+def test_csv_import_rejects_foreign_header(client):
+    files = {"file": ("machines.csv", "personnel_number,first_name\n1000,Max\n", "text/csv")}
+    response = client.post("/csv/machines", files=files)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Row 1: Unexpected columns in CSV header: personnel_number, first_name"
+
+
+def test_csv_import_keeps_unicode_line_separators_inside_cells(client):
+    content = "code,name\nM-LS-1,Presse\u2028Linie 1\nM-LS-2,Fräse\x85B\n"
+    files = {"file": ("machines.csv", content.encode(), "text/csv")}
+    response = client.post("/csv/machines", files=files)
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 2, "updated": 0}
+
+    names = {machine["code"]: machine["name"] for machine in client.get("/machines").json()}
+    assert names == {"M-LS-1": "Presse\u2028Linie 1", "M-LS-2": "Fräse\x85B"}
+
+
+def test_import_all_loads_master_data_before_dependent_files(connection):
+    files = {
+        "activity_records": io.StringIO(
+            "id,start_time,end_time,personnel_number,operation_code,quantity_good,quantity_reject,status,comment\n"
+            ",2024-04-02T06:00:00,,ALL-1,OP-ALL-10,25,1,,\n"
+        ),
+        "operations": io.StringIO(
+            "code,description,order_number,machine_code,standard_time_minutes,is_active\n"
+            "OP-ALL-10,Fräsen,WO-ALL-1,M-ALL-1,3.5,true\n"
+        ),
+        "employees": io.StringIO("personnel_number,first_name,last_name\nALL-1,Erika,Muster\n"),
+        "machines": io.StringIO("code,name\nM-ALL-1,Fräse\n"),
+        "work_orders": io.StringIO("order_number,customer\nWO-ALL-1,Kunde\n"),
+    }
+    turn = threading.Lock()
+    opened = []
+
+    class WorkerSession(Session):
+        # Workers share the test connection, which is not thread-safe, so each holds
+        # it for the lifetime of its session.
+        def __init__(self) -> None:
+            turn.acquire()
+            super().__init__(bind=connection, autoflush=False, join_transaction_mode="create_savepoint")
+            opened.append(self)
+
+        def close(self) -> None:
+            try:
+                super().close()
+            finally:
+                turn.release()
+
+    summaries = csv_io.import_all(WorkerSession, files)
+    assert len(opened) == len(files)
+    assert {entity: summary.as_dict() for entity, summary in summaries.items()} == {
+        entity: {"inserted": 1, "updated": 0} for entity in files
+    }
+
+    db = TestingSessionLocal(bind=connection)
+    try:
+        operation = crud.get_operation_by_code(db, "OP-ALL-10")
+        assert operation.work_order.order_number == "WO-ALL-1"
+        assert operation.machine.code == "M-ALL-1"
+        (activity,) = operation.activities
+        assert activity.employee.personnel_number == "ALL-1"
+    finally:
+        db.close()
+
+    with pytest.raises(csv_io.CSVImportError, match="Unknown entities: shifts"):
+        csv_io.import_all(WorkerSession, {"shifts": io.StringIO("")})
+
+
+def test_create_rejects_dangling_references(client):
+    response = client.post("/operations", json={"code": "OP-DANGLING", "work_order_id": 999999})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Work order with id 999999 not found"
+
+    response = client.post(
+        "/activity-records",
+        json={"start_time": "2024-05-01T06:00:00", "employee_id": 999999, "operation_id": 999998},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Employee with id 999999 not found"
+
+
+def test_bulk_create_returns_rows_in_input_order(client, connection):
+    work_order_id = client.post("/work-orders", json={"order_number": "WO-BULK-1"}).json()["id"]
+    codes = ["OP-BULK-30", "OP-BULK-10", "OP-BULK-20"]
+
+    db = TestingSessionLocal(bind=connection)
+    try:
+        created = crud.create_operations_bulk(
+            db, [schemas.OperationCreate(code=code, work_order_id=work_order_id) for code in codes]
+        )
+        assert [operation.code for operation in created] == codes
+        assert [crud.get_operation_by_code(db, code).id for code in codes] == [
+            operation.id for operation in created
+        ]
+
+        employee = crud.create_employee(
+            db, schemas.EmployeeCreate(personnel_number="BULK-1", first_name="Erika", last_name="Muster")
+        )
+        quantities = [7, 3, 5]
+        records = crud.create_activity_records_bulk(
+            db,
+            [
+                schemas.ActivityRecordCreate(
+                    start_time=datetime(2024, 5, 2, 6),
+                    employee_id=employee.id,
+                    operation_id=created[0].id,
+                    quantity_good=quantity,
+                )
+                for quantity in quantities
+            ],
+        )
+        assert [record.quantity_good for record in records] == quantities
+        db.expunge_all()
+        assert [crud.get_activity_record(db, record.id).quantity_good for record in records] == quantities
+    finally:
+        db.close()
+
+
+def test_csv_export_revalidation_sees_deletions(client):
+    machine_id = client.post("/machines", json={"code": "M-DEL-1", "name": "Presse"}).json()["id"]
+    client.post("/machines", json={"code": "M-DEL-2", "name": "Fräse"})
+    etag = client.get("/csv/machines").headers["etag"]
+
+    assert client.delete(f"/machines/{machine_id}").status_code == 204
+
+    response = client.get("/csv/machines", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert "M-DEL-1" not in response.text
+
+
+def test_table_revisions_advance_only_on_commit(client, connection):
+    def revisions():
+        return dict(connection.execute(select(models.TableRevision.table_name, models.TableRevision.revision)).all())
+
+    work_order_id = client.post("/work-orders", json={"order_number": "WO-REV-1"}).json()["id"]
+    client.post("/operations", json={"code": "OP-REV-10", "work_order_id": work_order_id})
+    before = revisions()
+    operations_etag = client.get("/csv/operations").headers["etag"]
+
+    # Rejected writes are rolled back together with their revision bump.
+    response = client.post("/operations", json={"code": "OP-REV-10", "work_order_id": work_order_id})
+    assert response.status_code == 400
+    assert revisions() == before
+
+    # Deleting the work order cascades to its operations, which changes their export too.
+    assert client.delete(f"/work-orders/{work_order_id}").status_code == 204
+    after = revisions()
+    assert after["work_orders"] == before["work_orders"] + 1
+    assert after["operations"] == before["operations"] + 1
+    assert after["machines"] == before["machines"]
+    assert client.get("/csv/operations", headers={"If-None-Match": operations_etag}).status_code == 200
+
+
+# Schema written by the first release, before updated_at and the secondary indexes.
+LEGACY_SCHEMA = (
+    "CREATE TABLE employees (id INTEGER NOT NULL, personnel_number VARCHAR(50) NOT NULL, "
+    "first_name VARCHAR(120) NOT NULL, last_name VARCHAR(120) NOT NULL, department VARCHAR(120), "
+    "role VARCHAR(120), active BOOLEAN NOT NULL, PRIMARY KEY (id), UNIQUE (personnel_number))",
+    "CREATE INDEX ix_employees_id ON employees (id)",
+    "CREATE TABLE machines (id INTEGER NOT NULL, code VARCHAR(50) NOT NULL, name VARCHAR(120) NOT NULL, "
+    "description VARCHAR(250), location VARCHAR(120), active BOOLEAN NOT NULL, PRIMARY KEY (id), "
+    "UNIQUE (code))",
+    "CREATE INDEX ix_machines_id ON machines (id)",
+    "CREATE TABLE work_orders (id INTEGER NOT NULL, order_number VARCHAR(50) NOT NULL, "
+    "customer VARCHAR(120), article VARCHAR(120), quantity INTEGER, due_date DATE, status VARCHAR(50), "
+    "PRIMARY KEY (id), UNIQUE (order_number))",
+    "CREATE INDEX ix_work_orders_id ON work_orders (id)",
+    "CREATE TABLE operations (id INTEGER NOT NULL, code VARCHAR(50) NOT NULL, description VARCHAR(250), "
+    "work_order_id INTEGER NOT NULL, machine_id INTEGER, standard_time_minutes FLOAT, "
+    "is_active BOOLEAN NOT NULL, PRIMARY KEY (id), CONSTRAINT uq_operation_code UNIQUE (code), "
+    "FOREIGN KEY(work_order_id) REFERENCES work_orders (id), FOREIGN KEY(machine_id) REFERENCES machines (id))",
+    "CREATE INDEX ix_operations_id ON operations (id)",
+    "CREATE TABLE activity_records (id INTEGER NOT NULL, start_time DATETIME NOT NULL, end_time DATETIME, "
+    "employee_id INTEGER NOT NULL, operation_id INTEGER NOT NULL, quantity_good INTEGER NOT NULL, "
+    "quantity_reject INTEGER NOT NULL, status VARCHAR(50), comment VARCHAR(250), PRIMARY KEY (id), "
+    "FOREIGN KEY(employee_id) REFERENCES employees (id), FOREIGN KEY(operation_id) REFERENCES operations (id))",
+    "CREATE INDEX ix_activity_records_id ON activity_records (id)",
+)
+
+
+def test_startup_upgrades_tables_from_earlier_releases(monkeypatch):
+    legacy = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with legacy.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql("INSERT INTO machines (code, name, active) VALUES ('M-OLD-1', 'Altbestand', 1)")
+
+    LegacySession = sessionmaker(bind=legacy, autoflush=False, expire_on_commit=False)
+
+    def legacy_db():
+        db = LegacySession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(main, "engine", legacy)
+    monkeypatch.setenv("AUTO_CREATE_SCHEMA", "1")
+    monkeypatch.setitem(app.dependency_overrides, get_db, legacy_db)
+    with TestClient(app) as legacy_client:
+        response = legacy_client.get("/machines")
+        assert response.status_code == 200
+        (machine,) = response.json()
+        assert machine["code"] == "M-OLD-1"
+        assert legacy_client.put(f"/machines/{machine['id']}", json={"location": "Halle C"}).status_code == 200
+        response = legacy_client.get("/csv/machines")
+        assert response.status_code == 200
+        assert "M-OLD-1,Altbestand,,Halle C,true" in response.text
+
+    inspector = inspect(legacy)
+    index_names = {
+        index["name"] for table in Base.metadata.sorted_tables for index in inspector.get_indexes(table.name)
+    }
+    assert {
+        "ix_operations_work_order",
+        "ix_activity_emp_op_time",
+        "ix_activity_records_start_time_desc",
+    } <= index_names
+    # Key columns are already indexed by their UNIQUE constraints; no duplicate is added.
+    assert not {"ix_employees_personnel_number", "ix_machines_code", "ix_work_orders_order_number"} & index_names
+
+
+def test_writes_without_returning_support(client, monkeypatch):
+    # MySQL has neither sorted executemany RETURNING nor UPDATE/DELETE ... RETURNING.
+    for flag in ("insert_executemany_returning_sort_by_parameter_order", "update_returning", "delete_returning"):
+        monkeypatch.setattr(engine.dialect, flag, False)
+
+    work_order_id = client.post("/work-orders", json={"order_number": "WO-NORET-1"}).json()["id"]
+    response = client.post("/operations", json={"code": "OP-NORET-10", "work_order_id": work_order_id})
+    assert response.status_code == 201
+    operation_id = response.json()["id"]
+    assert response.json()["code"] == "OP-NORET-10"
+    assert client.get(f"/operations/{operation_id}").json()["work_order_id"] == work_order_id
+
+    machine_id = client.post("/machines", json={"code": "M-NORET-1", "name": "Presse"}).json()["id"]
+    response = client.put(f"/machines/{machine_id}", json={"location": "Halle D"})
+    assert response.status_code == 200
+    assert response.json()["location"] == "Halle D"
+    assert client.put("/machines/999999", json={"name": "Fehlt"}).status_code == 404
+
+    employee_id = client.post(
+        "/employees", json={"personnel_number": "NORET-1", "first_name": "Erika", "last_name": "Muster"}
+    ).json()["id"]
+    record_id = client.post(
+        "/activity-records",
+        json={"start_time": "2024-06-01T06:00:00", "employee_id": employee_id, "operation_id": operation_id},
+    ).json()["id"]
+    assert client.delete(f"/activity-records/{record_id}").status_code == 204
+    assert client.delete(f"/activity-records/{record_id}").status_code == 404